@@ -0,0 +1,276 @@
+import math
+import os
+import warnings
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+import numpy as np
+import shapely
+
+# directories, relative to the repository root so the build can run from anywhere
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+LOCATIONS_DIR = os.path.join(REPO_DIR, "locs")
+SHAPE_FILE_DIR = os.path.join(REPO_DIR, "datasets", "yang_shape_files")
+REGISTRY_PATH = os.path.join(REPO_DIR, "datasets", "regions", "regions.npz")
+
+# topology-preserving simplification in degrees applied by the build, None keeps full detail
+SIMPLIFY_TOLERANCE = None
+
+# in order of preference when a directory holds the same region in several formats
+REGION_FILE_TYPES = (".shp", ".geojson")
+
+
+@dataclass(frozen=True)
+class GridSpec:
+    # a regular lon/lat grid with rows running from north to south
+    x0: float  # west edge
+    y0: float  # north edge
+    dx: float  # pixel size in degrees
+    dy: float
+    width: int  # pixels
+    height: int
+
+    def window(self, bounds: tuple[float, float, float, float]) -> tuple[int, int, int, int]:
+        """Returns (row_start, row_stop, col_start, col_stop) of the pixels whose
+        centres lie within the bounds, i.e. the same pixels as masking
+        `lat`/`lon` with `>= min` and `<= max`.
+        """
+        minx, miny, maxx, maxy = bounds
+        eps = 1e-9
+        col_start = math.ceil((minx - self.x0) / self.dx - 0.5 - eps)
+        col_stop = math.floor((maxx - self.x0) / self.dx - 0.5 + eps) + 1
+        row_start = math.ceil((self.y0 - maxy) / self.dy - 0.5 - eps)
+        row_stop = math.floor((self.y0 - miny) / self.dy - 0.5 + eps) + 1
+        col_start, col_stop = (min(max(c, 0), self.width) for c in (col_start, col_stop))
+        row_start, row_stop = (min(max(r, 0), self.height) for r in (row_start, row_stop))
+        return row_start, max(row_start, row_stop), col_start, max(col_start, col_stop)
+
+    def matches(self, latitude, longitude) -> bool:
+        # whether a file's lat/lon pixel centres lie on this grid
+        return (
+            len(latitude) == self.height
+            and len(longitude) == self.width
+            and math.isclose(float(latitude[0]), self.y0 - self.dy / 2, abs_tol=self.dy / 100)
+            and math.isclose(float(longitude[0]), self.x0 + self.dx / 2, abs_tol=self.dx / 100)
+        )
+
+
+# grids of the level 3 mapped MODIS products
+GRIDS = {
+    "modis_4km": GridSpec(-180.0, 90.0, 1 / 24, 1 / 24, 8640, 4320),
+    "modis_9km": GridSpec(-180.0, 90.0, 1 / 12, 1 / 12, 4320, 2160),
+}
+
+
+def find_region_files(dirs: list[str]) -> list[str]:
+    # find all the shapefiles and geojson files in the given directories
+    files = []
+    for dir_path in dirs:
+        if not os.path.isdir(dir_path):
+            warnings.warn(f"Region directory {os.path.abspath(dir_path)} does not exist, skipping it")
+            continue
+
+        # one file per region: a shapefile wins over a geojson converted from it
+        sources: dict[str, str] = {}
+        for file_type in REGION_FILE_TYPES:
+            for f in os.listdir(dir_path):
+                stem, ext = os.path.splitext(f)
+                if ext == file_type and stem not in sources:
+                    sources[stem] = os.path.join(dir_path, f)
+        files += [sources[stem] for stem in sorted(sources)]
+
+    if not files:
+        raise FileNotFoundError(
+            f"No {'/'.join(REGION_FILE_TYPES)} files found in {[os.path.abspath(d) for d in dirs]}"
+        )
+    return files
+
+
+def _load_region(file: str, simplify_tolerance: Optional[float]) -> Optional[dict]:
+    # runs in a worker process: parse one region file and reduce it to WKB plus metadata,
+    # or None if the file holds no geometry
+    import geopandas as gpd
+    from pyproj import Geod
+
+    gdf = gpd.read_file(file)
+    if gdf.crs is not None and not gdf.crs.equals("EPSG:4326"):
+        gdf = gdf.to_crs("EPSG:4326")
+
+    # one region per file, as the notebooks did with total_bounds; shapefiles often hold
+    # self-intersecting polygons, which the union would reject, so repair them first
+    geometry = shapely.union_all(shapely.make_valid(gdf.geometry.values))
+    if geometry.is_empty:
+        return None
+    bounds = tuple(float(b) for b in geometry.bounds)
+    area_km2 = abs(Geod(ellps="WGS84").geometry_area_perimeter(geometry)[0]) / 1e6
+
+    # bounds and area come from the full geometry so that crops never shrink
+    if simplify_tolerance:
+        geometry = shapely.simplify(geometry, simplify_tolerance, preserve_topology=True)
+
+    return {
+        "name": os.path.splitext(os.path.basename(file))[0],
+        "source": os.path.relpath(os.path.abspath(file), REPO_DIR),
+        "group": os.path.basename(os.path.normpath(os.path.dirname(file))),
+        "wkb": shapely.to_wkb(geometry),
+        "bounds": bounds,
+        "area_km2": area_km2,
+    }
+
+
+def build_registry(
+    files: list[str],
+    output_path: str = REGISTRY_PATH,
+    simplify_tolerance: Optional[float] = None,
+    grids: Optional[dict[str, GridSpec]] = None,
+    max_workers: Optional[int] = None,
+) -> None:
+    """Parses all region files once, in parallel, into a single binary store.
+
+    Args:
+        files: shapefiles and/or geojson files, one region per file named after the file
+            and grouped by the directory it is in.
+        output_path: where to write the `.npz` registry.
+        simplify_tolerance: optional topology-preserving simplification in degrees.
+        grids: grids to precompute index windows for, defaults to `GRIDS`.
+        max_workers: number of worker processes.
+    """
+    if not files:
+        raise ValueError("No region files to build the registry from")
+    grids = GRIDS if grids is None else grids
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        loaded = list(executor.map(_load_region, files, [simplify_tolerance] * len(files)))
+
+    regions = []
+    for file, region in zip(files, loaded):
+        if region is None:
+            warnings.warn(f"{file} has no geometry, leaving it out of the registry")
+        else:
+            regions.append(region)
+    if not regions:
+        raise ValueError("None of the region files hold any geometry")
+
+    names = [r["name"] for r in regions]
+    duplicates = sorted(n for n, count in Counter(names).items() if count > 1)
+    if duplicates:
+        raise ValueError(f"Duplicate region names: {duplicates}")
+
+    wkbs = [r["wkb"] for r in regions]
+    offsets = np.zeros(len(wkbs) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(w) for w in wkbs])
+    bounds = np.array([r["bounds"] for r in regions], dtype=np.float64).reshape(-1, 4)
+
+    grid_names = list(grids)
+    grid_params = np.array(
+        [[g.x0, g.y0, g.dx, g.dy, g.width, g.height] for g in grids.values()], dtype=np.float64
+    ).reshape(-1, 6)
+    windows = np.array(
+        [[grids[g].window(tuple(b)) for b in bounds] for g in grid_names], dtype=np.int64
+    ).reshape(len(grid_names), len(regions), 4)
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    np.savez(
+        output_path,
+        names=np.array(names, dtype=str),
+        sources=np.array([r["source"] for r in regions], dtype=str),
+        groups=np.array([r["group"] for r in regions], dtype=str),
+        bounds=bounds,
+        area_km2=np.array([r["area_km2"] for r in regions], dtype=np.float64),
+        wkb=np.frombuffer(b"".join(wkbs), dtype=np.uint8),
+        wkb_offsets=offsets,
+        grid_names=np.array(grid_names, dtype=str),
+        grid_params=grid_params,
+        windows=windows,
+    )
+
+
+class RegionRegistry:
+    """Name-based lookup into a registry written by `build_registry`.
+
+    Bounds, areas and grid windows are plain arrays; geometries are only
+    decoded from WKB when asked for.
+    """
+
+    def __init__(self, path: str = REGISTRY_PATH):
+        with np.load(path, allow_pickle=False) as store:
+            self.names = store["names"].tolist()
+            self.sources = store["sources"].tolist()
+            self.groups = store["groups"].tolist()
+            self.bounds_array = store["bounds"]
+            self.area_array = store["area_km2"]
+            self.wkb = store["wkb"].tobytes()
+            self.wkb_offsets = store["wkb_offsets"]
+            grid_names = store["grid_names"].tolist()
+            grid_params = store["grid_params"]
+            windows = store["windows"]
+
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.grids = {
+            name: GridSpec(*p[:4], int(p[4]), int(p[5])) for name, p in zip(grid_names, grid_params)
+        }
+        self.windows = dict(zip(grid_names, windows))
+        self._geometries: dict[str, shapely.Geometry] = {}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.index
+
+    def _i(self, name: str) -> int:
+        try:
+            return self.index[name]
+        except KeyError:
+            raise KeyError(f"Unknown region {name!r}, available: {self.names}") from None
+
+    def bounds(self, name: str) -> tuple[float, float, float, float]:
+        # [minx, miny, maxx, maxy], same as `gdf.total_bounds`
+        return tuple(self.bounds_array[self._i(name)].tolist())
+
+    def area_km2(self, name: str) -> float:
+        return float(self.area_array[self._i(name)])
+
+    def source(self, name: str) -> str:
+        # absolute path of the file the region was built from
+        return os.path.normpath(os.path.join(REPO_DIR, self.sources[self._i(name)]))
+
+    def group(self, name: str) -> str:
+        # the directory the region came from, e.g. "locs" or "yang_shape_files"
+        return self.groups[self._i(name)]
+
+    def window(self, name: str, grid: str) -> tuple[slice, slice]:
+        """Returns (row slice, column slice) of the region on a precomputed grid."""
+        if grid not in self.windows:
+            raise KeyError(f"Unknown grid {grid!r}, available: {list(self.windows)}")
+        row_start, row_stop, col_start, col_stop = self.windows[grid][self._i(name)].tolist()
+        return slice(row_start, row_stop), slice(col_start, col_stop)
+
+    def geometry(self, name: str) -> shapely.Geometry:
+        if name not in self._geometries:
+            i = self._i(name)
+            start, stop = self.wkb_offsets[i], self.wkb_offsets[i + 1]
+            self._geometries[name] = shapely.from_wkb(self.wkb[start:stop])
+        return self._geometries[name]
+
+    def to_geodataframe(self, names: Optional[list[str]] = None):
+        # for plotting; geopandas is only needed here
+        import geopandas as gpd
+
+        names = self.names if names is None else names
+        return gpd.GeoDataFrame(
+            {"name": names, "area_km2": [self.area_km2(n) for n in names]},
+            geometry=[self.geometry(n) for n in names],
+            crs="EPSG:4326",
+        )
+
+
+if __name__ == "__main__":
+    files = find_region_files([LOCATIONS_DIR, SHAPE_FILE_DIR])
+    build_registry(files, REGISTRY_PATH, simplify_tolerance=SIMPLIFY_TOLERANCE)
+    print(f"Saved {len(files)} regions to {REGISTRY_PATH}")
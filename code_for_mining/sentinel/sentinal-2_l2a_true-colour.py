@@ -1,47 +1,40 @@
 import os
-from sentinelhub import WmsRequest, BBox, CRS, DataCollection, SHConfig
-import geopandas as gpd
-import matplotlib.pyplot as plt
+import sys
 
-### ADD CREDENTIALS HERE ###
+from dotenv import load_dotenv
+from sentinelhub import SHConfig
 
-# set up configuration
-config = SHConfig()
-config.sh_client_id = my_client_id
-config.sh_client_secret = my_client_secret
-config.instance_id = my_instance_id
+from sentinel_tiles import fetch_region, sentinelhub_fetcher
 
-# load the geojson file into a geodataframe
-gdf = gpd.read_file("map.geojson")
+sys.path.append("../regions")
+from region_registry import RegionRegistry
 
-# print the crs
-print(gdf.crs)
+# region to fetch, by name in the registry built by ../regions/region_registry.py
+REGION = "snake"
+REGISTRY_PATH = "../../datasets/regions/regions.npz"
 
-# find bounding box
-bbox_coords = gdf.total_bounds  # it returns [minx, miny, maxx, maxy]
-bbox_coords = [bbox_coords[0], bbox_coords[1], bbox_coords[2], bbox_coords[3]]  # reordering to [miny, minx, maxy, maxx]
+# credentials are read from a .env file, see .env_template
+load_dotenv()
 
-# create a BBox object
-bbox = BBox(bbox=bbox_coords, crs=CRS.WGS84)
-
-# initiate WMS request
-l2a_request = WmsRequest(
-    data_collection=DataCollection.SENTINEL2_L2A,
+# set up configuration
+config = SHConfig()
+config.sh_client_id = os.getenv("SH_CLIENT_ID")
+config.sh_client_secret = os.getenv("SH_CLIENT_SECRET")
+config.instance_id = os.getenv("SH_INSTANCE_ID")
+
+# look up the precomputed bounding box, [minx, miny, maxx, maxy] in WGS84 as BBox expects
+registry = RegionRegistry(REGISTRY_PATH)
+bbox_coords = registry.bounds(REGION)
+
+# fetch the region tile by tile, cached on disk, and save it as a georeferenced png
+image, grid = fetch_region(
+    bbox_coords,
+    sentinelhub_fetcher(config),
+    time_range=("2017-08-01", "2017-08-31"),
+    output_path="out.png",
     layer="TRUE-COLOR-S2-L2A",
-    bbox=bbox,
-    # time="2017-07-30",
-    time=("2017-08-01", "2017-08-31"),
-    width=2048,
-    config=config
+    resolution_m=1000.0,  # coarse overview of the whole region, lower it for detail
+    cache_dir="../../datasets/sentinel/tile_cache",
 )
 
-# fetch data
-l2a_data = l2a_request.get_data()
-
-# plot and save image
-def plot_image(image):
-    plt.imshow(image)
-    plt.axis('off')
-    plt.savefig('out.png', bbox_inches='tight',dpi=2000)
-
-plot_image(l2a_data[0])
\ No newline at end of file
+print(f"Saved {grid.width}x{grid.height} px mosaic from {len(grid.tiles)} tiles")
@@ -0,0 +1,291 @@
+import hashlib
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import numpy as np
+from PIL import Image
+from tqdm import tqdm
+
+# metres per degree of latitude (and of longitude at the equator) on WGS84
+METRES_PER_DEGREE = 111_320.0
+
+# largest mosaic tile_grid allows, about 300 MB as RGB uint8
+MAX_PIXELS = 100_000_000
+
+# evalscripts for the layers sentinelhub_fetcher knows, each returning RGB uint8
+EVALSCRIPTS = {
+    "TRUE-COLOR-S2-L2A": """
+//VERSION=3
+function setup() {
+  return {input: ["B02", "B03", "B04"], output: {bands: 3, sampleType: "UINT8"}};
+}
+function evaluatePixel(sample) {
+  return [2.5 * sample.B04 * 255, 2.5 * sample.B03 * 255, 2.5 * sample.B02 * 255];
+}
+""",
+}
+
+# how sentinelhub_fetcher combines the acquisitions in a time range, least cloudy on top
+MOSAICKING_ORDER = "leastCC"
+
+# a fetcher gets (bbox, time_range, layer, width, height) and returns an image
+# array of shape (height, width, bands); swap it for a local stand-in to run
+# the pipeline without hitting Sentinel Hub
+Fetcher = Callable[[tuple[float, float, float, float], tuple[str, str], str, int, int], np.ndarray]
+
+
+@dataclass(frozen=True)
+class Tile:
+    row: int
+    col: int
+    bbox: tuple[float, float, float, float]  # [minx, miny, maxx, maxy] in WGS84
+    width: int  # pixels
+    height: int  # pixels
+    x_offset: int  # pixel offset of the tile in the mosaic
+    y_offset: int
+
+
+@dataclass(frozen=True)
+class TileGrid:
+    bounds: tuple[float, float, float, float]
+    pixel_size: tuple[float, float]  # (dx, dy) in degrees
+    width: int  # mosaic size in pixels
+    height: int
+    tiles: list[Tile]
+
+    def geotransform(self) -> tuple[float, float, float, float, float, float]:
+        # GDAL order: top left x, pixel width, 0, top left y, 0, -pixel height
+        dx, dy = self.pixel_size
+        return (self.bounds[0], dx, 0.0, self.bounds[3], 0.0, -dy)
+
+
+def tile_grid(
+    bounds: tuple[float, float, float, float],
+    resolution_m: float = 10.0,
+    tile_px: int = 2048,
+    max_pixels: int = MAX_PIXELS,
+) -> TileGrid:
+    """Splits a WGS84 bounding box into a grid of tiles at a target resolution.
+
+    Args:
+        bounds: [minx, miny, maxx, maxy] as returned by `gdf.total_bounds`.
+        resolution_m: target ground resolution in metres per pixel.
+        tile_px: maximum tile edge in pixels, kept below the service limit.
+        max_pixels: largest mosaic allowed, the whole mosaic is held in memory.
+    """
+    minx, miny, maxx, maxy = (float(b) for b in bounds)
+    if minx >= maxx or miny >= maxy:
+        raise ValueError(f"Empty bounding box: {bounds}")
+
+    # convert the resolution to degrees at the centre latitude of the region
+    centre_lat = math.radians((miny + maxy) / 2)
+    dy = resolution_m / METRES_PER_DEGREE
+    dx = resolution_m / (METRES_PER_DEGREE * max(math.cos(centre_lat), 1e-6))
+
+    width = max(1, math.ceil((maxx - minx) / dx))
+    height = max(1, math.ceil((maxy - miny) / dy))
+    if width * height > max_pixels:
+        fitting_resolution = math.ceil(resolution_m * math.sqrt(width * height / max_pixels))
+        raise ValueError(
+            f"Region is {width}x{height} px at {resolution_m} m, more than max_pixels={max_pixels}; "
+            f"use resolution_m >= {fitting_resolution} or split the region"
+        )
+
+    # snap the bounds to the pixel grid so that tiles line up exactly
+    maxx = minx + width * dx
+    miny = maxy - height * dy
+
+    tiles = []
+    for row, y_offset in enumerate(range(0, height, tile_px)):
+        tile_height = min(tile_px, height - y_offset)
+        for col, x_offset in enumerate(range(0, width, tile_px)):
+            tile_width = min(tile_px, width - x_offset)
+            bbox = (
+                minx + x_offset * dx,
+                maxy - (y_offset + tile_height) * dy,
+                minx + (x_offset + tile_width) * dx,
+                maxy - y_offset * dy,
+            )
+            tiles.append(Tile(row, col, bbox, tile_width, tile_height, x_offset, y_offset))
+
+    return TileGrid((minx, miny, maxx, maxy), (dx, dy), width, height, tiles)
+
+
+class RateLimiter:
+    """Allows at most `max_per_second` calls to `wait` per second across threads."""
+
+    def __init__(self, max_per_second: float):
+        self.interval = 1.0 / max_per_second if max_per_second > 0 else 0.0
+        self.lock = threading.Lock()
+        self.next_time = 0.0
+
+    def wait(self) -> None:
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_time)
+            self.next_time = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def layer_version(layer: str) -> str:
+    # short hash of what a layer produces, so redefining a layer invalidates its cached tiles
+    definition = EVALSCRIPTS.get(layer, "") + MOSAICKING_ORDER
+    return hashlib.sha1(definition.encode()).hexdigest()[:8]
+
+
+class TileCache:
+    """On-disk cache of fetched tiles keyed by (tile, time range, layer definition)."""
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+
+    def path(self, tile: Tile, time_range: tuple[str, str], layer: str) -> str:
+        # the bbox and size identify the tile independently of the grid it came from
+        key = repr((tuple(round(c, 9) for c in tile.bbox), tile.width, tile.height))
+        digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+        return os.path.join(
+            self.cache_dir,
+            f"{layer}_{layer_version(layer)}",
+            f"{time_range[0]}_{time_range[1]}",
+            f"{digest}.npy",
+        )
+
+    def load(self, tile: Tile, time_range: tuple[str, str], layer: str) -> Optional[np.ndarray]:
+        path = self.path(tile, time_range, layer)
+        if not os.path.exists(path):
+            return None
+        return np.load(path)
+
+    def save(self, tile: Tile, time_range: tuple[str, str], layer: str, data: np.ndarray) -> None:
+        path = self.path(tile, time_range, layer)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write to a temporary file first so an interrupted run never leaves a broken tile
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, data)
+        os.replace(tmp_path, path)
+
+
+def sentinelhub_fetcher(config) -> Fetcher:
+    # build a fetcher that issues one Process API request per tile; the service
+    # mosaics all acquisitions in the time range into a single image
+    from sentinelhub import (
+        BBox,
+        CRS,
+        DataCollection,
+        MimeType,
+        MosaickingOrder,
+        SentinelHubRequest,
+    )
+
+    def fetch(bbox, time_range, layer, width, height) -> np.ndarray:
+        if layer not in EVALSCRIPTS:
+            raise ValueError(f"Unknown layer {layer!r}, available: {list(EVALSCRIPTS)}")
+        request = SentinelHubRequest(
+            evalscript=EVALSCRIPTS[layer],
+            input_data=[
+                SentinelHubRequest.input_data(
+                    data_collection=DataCollection.SENTINEL2_L2A,
+                    time_interval=time_range,
+                    mosaicking_order=MosaickingOrder(MOSAICKING_ORDER),
+                )
+            ],
+            responses=[SentinelHubRequest.output_response("default", MimeType.PNG)],
+            bbox=BBox(bbox=bbox, crs=CRS.WGS84),  # BBox expects [minx, miny, maxx, maxy]
+            size=(width, height),
+            config=config,
+        )
+        # one image per request; areas without acquisitions come back as zero pixels
+        return request.get_data()[0]
+
+    return fetch
+
+
+def fetch_tiles(
+    grid: TileGrid,
+    fetch: Fetcher,
+    time_range: tuple[str, str],
+    layer: str = "TRUE-COLOR-S2-L2A",
+    cache_dir: Optional[str] = None,
+    max_workers: int = 4,
+    max_per_second: float = 5.0,
+) -> dict[Tile, np.ndarray]:
+    """Fetches all tiles of a grid concurrently, reusing cached tiles where possible."""
+    cache = TileCache(cache_dir) if cache_dir else None
+    limiter = RateLimiter(max_per_second)
+
+    def fetch_tile(tile: Tile) -> np.ndarray:
+        if cache is not None:
+            cached = cache.load(tile, time_range, layer)
+            if cached is not None:
+                return cached
+
+        limiter.wait()
+        data = np.asarray(fetch(tile.bbox, time_range, layer, tile.width, tile.height))
+        if data.shape[:2] != (tile.height, tile.width):
+            raise ValueError(
+                f"Tile {tile.row},{tile.col} has shape {data.shape}, "
+                f"expected ({tile.height}, {tile.width}, ...)"
+            )
+
+        if cache is not None:
+            cache.save(tile, time_range, layer, data)
+        return data
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(tqdm(executor.map(fetch_tile, grid.tiles), total=len(grid.tiles)))
+
+    return dict(zip(grid.tiles, results))
+
+
+def mosaic(grid: TileGrid, tiles: dict[Tile, np.ndarray]) -> np.ndarray:
+    # paste the tiles into a single array covering the whole grid
+    first = next(iter(tiles.values()))
+    out = np.zeros((grid.height, grid.width) + first.shape[2:], dtype=first.dtype)
+    for tile, data in tiles.items():
+        out[tile.y_offset : tile.y_offset + tile.height, tile.x_offset : tile.x_offset + tile.width] = data
+    return out
+
+
+def save_georeferenced(image: np.ndarray, grid: TileGrid, output_path: str) -> None:
+    """Saves the mosaic with Pillow, next to a world file holding the georeference.
+
+    The world file (e.g. `out.pgw` for `out.png`) is read by QGIS/GDAL to place
+    the image in WGS84.
+    """
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    Image.fromarray(image).save(output_path)
+
+    # world files reference the centre of the top left pixel
+    x0, dx, _, y0, _, neg_dy = grid.geotransform()
+    root, ext = os.path.splitext(output_path)
+    world_file = f"{root}.{ext[1]}{ext[-1]}w" if len(ext) > 2 else f"{root}.wld"
+    with open(world_file, "w") as f:
+        f.write(f"{dx}\n0.0\n0.0\n{neg_dy}\n{x0 + dx / 2}\n{y0 + neg_dy / 2}\n")
+
+
+def fetch_region(
+    bounds: tuple[float, float, float, float],
+    fetch: Fetcher,
+    time_range: tuple[str, str],
+    output_path: str,
+    layer: str = "TRUE-COLOR-S2-L2A",
+    resolution_m: float = 10.0,
+    tile_px: int = 2048,
+    cache_dir: Optional[str] = None,
+    max_workers: int = 4,
+    max_per_second: float = 5.0,
+    max_pixels: int = MAX_PIXELS,
+) -> tuple[np.ndarray, TileGrid]:
+    # tile, fetch, mosaic and save a region in one go
+    grid = tile_grid(bounds, resolution_m, tile_px, max_pixels)
+    tiles = fetch_tiles(grid, fetch, time_range, layer, cache_dir, max_workers, max_per_second)
+    image = mosaic(grid, tiles)
+    save_georeferenced(image, grid, output_path)
+    return image, grid
@@ -0,0 +1,54 @@
+import os
+import tempfile
+
+import numpy as np
+
+from sentinel_tiles import fetch_region
+
+# run the tiled fetch against a local stand-in for Sentinel Hub, no credentials needed
+
+BOUNDS = (-170.0, -5.0, -169.9, -4.9)
+TIME_RANGE = ("2017-08-01", "2017-08-31")
+
+calls = []
+
+
+def fake_fetch(bbox, time_range, layer, width, height) -> np.ndarray:
+    # fill each tile with a colour derived from its bbox so we can find it in the mosaic
+    calls.append(bbox)
+    tile = np.zeros((height, width, 3), dtype=np.uint8)
+    tile[..., 0] = int(round((bbox[0] - BOUNDS[0]) * 1000)) % 256
+    tile[..., 1] = int(round((BOUNDS[3] - bbox[3]) * 1000)) % 256
+    return tile
+
+
+with tempfile.TemporaryDirectory() as tmp_dir:
+    output_path = os.path.join(tmp_dir, "out.png")
+    cache_dir = os.path.join(tmp_dir, "tile_cache")
+    options = dict(resolution_m=50.0, tile_px=100, cache_dir=cache_dir, max_per_second=0)
+
+    image, grid = fetch_region(BOUNDS, fake_fetch, TIME_RANGE, output_path, **options)
+
+    # mosaic shape and where each tile lands
+    assert image.shape == (grid.height, grid.width, 3), image.shape
+    assert len(calls) == len(grid.tiles) > 1
+    for tile in grid.tiles:
+        patch = image[tile.y_offset : tile.y_offset + tile.height, tile.x_offset : tile.x_offset + tile.width]
+        expected = fake_fetch(tile.bbox, TIME_RANGE, "", tile.width, tile.height)
+        assert (patch == expected).all(), f"tile {tile.row},{tile.col} misplaced"
+
+    # a second run is served from the cache without fetching anything
+    calls.clear()
+    image_cached, _ = fetch_region(BOUNDS, fake_fetch, TIME_RANGE, output_path, **options)
+    assert calls == [], f"{len(calls)} tiles fetched despite the cache"
+    assert (image_cached == image).all()
+
+    # the png and its world file are written
+    assert os.path.exists(output_path)
+    world_file = os.path.join(tmp_dir, "out.pgw")
+    with open(world_file) as f:
+        values = [float(line) for line in f]
+    dx, dy = grid.pixel_size
+    assert np.allclose(values, [dx, 0.0, 0.0, -dy, BOUNDS[0] + dx / 2, BOUNDS[3] - dy / 2])
+
+print(f"OK: {grid.width}x{grid.height} px mosaic from {len(grid.tiles)} tiles")